@@ -13,15 +13,33 @@ Mejoras v2.0:
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 from datetime import datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import gc
+import heapq
+import sqlite3
 import xml.etree.ElementTree as ET
 import pytz
 import logging
 from loguru import logger
 
+# JSON rápido (opcional - fallback a stdlib)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 
@@ -64,6 +82,29 @@ st.set_page_config(
 # Zona horaria Eastern (ESPN usa ET)
 TIMEZONE = pytz.timezone('US/Eastern')
 
+GC_GEN0_THRESHOLD = 50_000
+
+def ajustar_gc():
+    """
+    Ajuste del GC una sola vez por proceso (no por rerun).
+    
+    gc.freeze() saca módulos y objetos de arranque de las colecciones y el
+    umbral más alto de la generación 0 evita pausas en medio de cada rerun.
+    No se usa gc.disable(): con st.stop() no hay un punto final garantizado
+    donde recolectar a mano.
+    
+    La guarda es el propio umbral (estado del intérprete), no st.cache_resource:
+    'Refrescar Datos' limpia ese cache y un segundo freeze() congelaría para
+    siempre los objetos recién desalojados (liga, box scores).
+    """
+    if gc.get_threshold()[0] == GC_GEN0_THRESHOLD:
+        return
+    gc.freeze()
+    _, gen1, gen2 = gc.get_threshold()
+    gc.set_threshold(GC_GEN0_THRESHOLD, gen1, gen2)
+
+ajustar_gc()
+
 # --- 2. CSS OPTIMIZADO (SCROLL FIX) ---
 st.markdown("""
 <style>
@@ -171,7 +212,7 @@ st.markdown("""
 # --- 3. MOTOR DE DATOS ---
 
 # Mapeo maestro: ESPN API -> Código estándar de 3 letras
-ESPN_TO_STANDARD = {
+ESPN_TO_STANDARD = MappingProxyType({
     'PHI': 'PHI', 'PHL': 'PHI', '76ERS': 'PHI',
     'UTA': 'UTA', 'UTAH': 'UTA', 'UTH': 'UTA',
     'NY': 'NYK', 'NYK': 'NYK', 'NYA': 'NYK',
@@ -188,7 +229,10 @@ ESPN_TO_STANDARD = {
     'HOU': 'HOU', 'DET': 'DET', 'IND': 'IND', 'CLE': 'CLE',
     'CHI': 'CHI', 'ATL': 'ATL', 'BOS': 'BOS', 'OKC': 'OKC',
     'POR': 'POR', 'SAC': 'SAC'
-}
+})
+
+# Códigos estándar: fast-path sin strip()/upper() para el caso más común
+EQUIPOS_ESTANDAR = frozenset(ESPN_TO_STANDARD.values())
 
 # BACKUP SOS (Actualizado)
 BACKUP_SOS = {
@@ -201,8 +245,11 @@ BACKUP_SOS = {
 
 # --- FUNCIONES DE NORMALIZACIÓN ---
 
+@lru_cache(maxsize=128)
 def normalizar_equipo(abrev):
     """Convierte cualquier variante a formato estándar (GS -> GSW, SA -> SAS)"""
+    if abrev in EQUIPOS_ESTANDAR:
+        return abrev
     if not abrev:
         return ""
     s = str(abrev).strip().upper()
@@ -212,15 +259,11 @@ def equipos_match(eq1, eq2):
     """Verifica si dos equipos son el mismo (normalizado)"""
     return normalizar_equipo(eq1) == normalizar_equipo(eq2)
 
-def jugador_juega_hoy(pro_team, equipos_hoy_list):
+def equipos_en_juego(equipos_hoy_list):
     """
-    Verifica si el jugador juega hoy
-    - pro_team: str, equipo del jugador (ej: 'GS')
+    Construye el frozenset de equipos (normalizados) que juegan.
     - equipos_hoy_list: list, equipos que juegan. Puede ser ['GSW'] o [{'home': 'GSW', 'away': 'LAL'}]
     """
-    norm_team = normalizar_equipo(pro_team)
-    
-    # Extract all teams playing today
     playing_teams = set()
     for item in equipos_hoy_list:
         if isinstance(item, dict):
@@ -230,11 +273,220 @@ def jugador_juega_hoy(pro_team, equipos_hoy_list):
         else:
             # String (Legacy)
             playing_teams.add(normalizar_equipo(item))
-            
-    return norm_team in playing_teams
+    return frozenset(playing_teams)
+
+def jugador_juega_hoy(pro_team, equipos_hoy_list):
+    """
+    Verifica si el jugador juega hoy
+    - pro_team: str, equipo del jugador (ej: 'GS')
+    - equipos_hoy_list: list o set. Si es set, se asume ya construido con equipos_en_juego()
+    """
+    playing_teams = equipos_hoy_list if isinstance(equipos_hoy_list, (set, frozenset)) else equipos_en_juego(equipos_hoy_list)
+    return normalizar_equipo(pro_team) in playing_teams
+
+# --- CLIENTE HTTP ---
+
+# Timeout (connect, read): una respuesta lenta de ESPN no bloquea el rerun
+HTTP_TIMEOUT = (2, 5)
+
+@st.cache_resource
+def get_session():
+    """Sesión HTTP única para toda la app: keep-alive + reintentos con backoff ante fallos transitorios"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# Copia en disco del último resultado válido: sobrevive a reinicios del proceso
+# (solo calendario y partidos de hoy; payloads JSON como el resto de caches SQLite)
+LAST_GOOD_DB = 'data/fantasy_brain.db'
+LAST_GOOD_DIAS = 7  # Entradas más viejas se descartan al arrancar
+
+@st.cache_resource
+def _last_good():
+    """Último resultado válido por clave (fallback si ESPN falla), precargado desde disco"""
+    store = {}
+    try:
+        conn = sqlite3.connect(LAST_GOOD_DB)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS last_good (
+                key TEXT PRIMARY KEY,
+                saved_at TIMESTAMP,
+                payload TEXT
+            )
+        ''')
+        limite = (datetime.now() - timedelta(days=LAST_GOOD_DIAS)).isoformat()
+        conn.execute('DELETE FROM last_good WHERE saved_at < ?', (limite,))
+        for key, payload in conn.execute('SELECT key, payload FROM last_good'):
+            try:
+                store[key] = parse_json(payload)
+            except (TypeError, ValueError) as e:
+                logger.debug(f"Fallback '{key}' ilegible, se ignora: {e}")
+        conn.commit()
+        conn.close()
+        logger.info(f"Fallback en disco: {len(store)} entradas cargadas")
+    except sqlite3.Error as e:
+        logger.warning(f"No se pudo cargar el fallback en disco: {e}")
+    return store
+
+def guardar_last_good(clave, valor):
+    """Guarda un resultado válido (JSON-serializable) en memoria y en disco"""
+    _last_good()[clave] = valor
+    try:
+        conn = sqlite3.connect(LAST_GOOD_DB)
+        conn.execute(
+            'INSERT OR REPLACE INTO last_good (key, saved_at, payload) VALUES (?, ?, ?)',
+            (clave, datetime.now().isoformat(), dump_json(valor))
+        )
+        conn.commit()
+        conn.close()
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logger.warning(f"No se pudo guardar el fallback '{clave}': {e}")
+
+def en_paralelo(*tareas):
+    """
+    Ejecuta llamadas de red independientes en paralelo.
+    
+    Args:
+        *tareas: tuplas (función, *args)
+    
+    Returns:
+        list: resultados en el mismo orden que las tareas (las excepciones se propagan)
+    """
+    # Los hilos heredan el contexto de Streamlit para poder usar st.cache_*
+    ctx = get_script_run_ctx()
+    
+    def _run(tarea):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        fn, *args = tarea
+        return fn(*args)
+    
+    with ThreadPoolExecutor(max_workers=len(tareas)) as ex:
+        return list(ex.map(_run, tareas))
+
+def parse_json(raw):
+    """Decodifica JSON (bytes o str) con orjson si está disponible"""
+    return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+
+def dump_json(obj):
+    """Serializa a str JSON con orjson si está disponible"""
+    return orjson.dumps(obj).decode() if ORJSON_AVAILABLE else json.dumps(obj)
 
 # --- FUNCIONES DE DATOS ---
 
+@st.cache_resource(ttl=600, show_spinner=False)  # 10 minutos - rosters, lesiones y stats
+def get_liga(nombre_liga):
+    """
+    Cliente ESPN autenticado, compartido entre reruns.
+    
+    box_scores() enlaza home_team/away_team con League.teams, así que los
+    rosters (lesiones, stats, altas/bajas) son los de esta conexión: el TTL
+    la renueva cada 10 minutos. También se limpia con 'Refrescar Datos'.
+    """
+    if USE_MODERN_CONFIG:
+        # Conectar con retry automático
+        return obtener_liga(nombre_liga, LIGAS)
+    
+    # Legacy: necesita adaptar la función vieja
+    from src.conectar import obtener_liga as obtener_liga_legacy
+    # Hack temporal para compatibilidad
+    import sys
+    sys.modules['src.conectar'].LIGAS = LIGAS
+    return obtener_liga_legacy(nombre_liga)
+
+@st.cache_resource(ttl=120, show_spinner=False)  # 2 minutos - marcadores en vivo
+def get_box_scores(_liga, nombre_liga):
+    """
+    Box scores de la semana actual, memoizados por liga.
+    
+    Se usa cache_resource (no cache_data) porque los objetos de espn_api
+    se comparten tal cual, sin serializar. `_liga` no entra en la clave.
+    """
+    return _liga.box_scores()
+
+def buscar_matchup(box_scores, my_team_name, my_team_id=None):
+    """
+    Encuentra el matchup del usuario.
+    
+    Con my_team_id se usa un índice {team_id: (idx, soy_home)} (id estable de ESPN);
+    si no, se busca el nombre en una sola pasada (sin distinguir mayúsculas).
+    
+    Returns:
+        tuple: (idx, soy_home, encontrado). idx es la posición en box_scores
+               (None si no hay matchups). Si no hay coincidencia, cae al
+               primer matchup como home (encontrado=False).
+    """
+    if my_team_id:
+        indice = {
+            getattr(equipo, 'team_id', None): (idx, es_home)
+            for idx, m in enumerate(box_scores)
+            for equipo, es_home in ((m.home_team, True), (m.away_team, False))
+        }
+        if my_team_id in indice:
+            idx, es_home = indice[my_team_id]
+            return idx, es_home, True
+    
+    if my_team_name:
+        clave = my_team_name.casefold()  # Una vez, no por matchup
+        for idx, m in enumerate(box_scores):
+            if clave in m.home_team.team_name.casefold():
+                return idx, True, True
+            if clave in m.away_team.team_name.casefold():
+                return idx, False, True
+    
+    if box_scores:
+        return 0, True, False
+    return None, True, False
+
+def parse_scoreboard(data):
+    """
+    Extrae los partidos de un JSON de scoreboard ESPN.
+    
+    Returns:
+        list: [{'home': 'GSW', 'away': 'LAL'}, ...] con equipos normalizados.
+              Se omiten partidos sin dos equipos con abreviatura.
+    """
+    matches = []
+    for evento in data.get('events', ()):
+        comps = evento.get('competitions', ())
+        if not comps:
+            continue
+        
+        competitors = comps[0].get('competitors', ())
+        if len(competitors) != 2:
+            continue
+        
+        # ESPN marca 'homeAway' en cada competitor; si el primero no es home, lo es el segundo
+        home, away = competitors
+        if home.get('homeAway') != 'home':
+            home, away = away, home
+        
+        abrev_home = home.get('team', {}).get('abbreviation')
+        abrev_away = away.get('team', {}).get('abbreviation')
+        if abrev_home and abrev_away:
+            matches.append({
+                'home': normalizar_equipo(abrev_home),
+                'away': normalizar_equipo(abrev_away)
+            })
+    return matches
+
+def fetch_scoreboard(d_str, session=None):
+    """Descarga y parsea el scoreboard ESPN de un día (YYYYMMDD). Lanza excepción si falla."""
+    url = f"http://site.api.espn.com/apis/site/v2/sports/basketball/nba/scoreboard?dates={d_str}"
+    response = (session or get_session()).get(url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    return parse_scoreboard(parse_json(response.content))
+
+@st.cache_resource(ttl=600, show_spinner=False)  # 10 minutos
+def get_free_agents(_liga, nombre_liga, size=100):
+    """Free agents de la liga, compartidos entre reruns (objetos espn_api sin serializar)"""
+    return _liga.free_agents(size=size)
+
 @st.cache_data(ttl=1800)  # 30 minutos - para el grid semanal
 def get_calendario_semanal():
     """
@@ -251,57 +503,28 @@ def get_calendario_semanal():
         
         logger.info(f"Cargando calendario semanal desde {lunes.strftime('%Y-%m-%d')}")
         
-        for i in range(7):
-            d = lunes + timedelta(days=i)
-            d_str = d.strftime("%Y%m%d")
-            d_fmt = d.strftime("%a %d")
+        dias = [lunes + timedelta(days=i) for i in range(7)]
+        # Resolver en el hilo principal (contexto de Streamlit)
+        store = _last_good()
+        session = get_session()
+        
+        # Los 7 días en paralelo: la latencia total ~ el día más lento, no la suma
+        with ThreadPoolExecutor(max_workers=7) as ex:
+            futuros = [(d, ex.submit(fetch_scoreboard, d.strftime("%Y%m%d"), session)) for d in dias]
             
-            try:
-                url = f"http://site.api.espn.com/apis/site/v2/sports/basketball/nba/scoreboard?dates={d_str}"
-                response = requests.get(url, timeout=5)
-                response.raise_for_status()
-                
-                data = response.json()
-                matches = []
+            for d, futuro in futuros:
+                d_str = d.strftime("%Y%m%d")
+                d_fmt = d.strftime("%a %d")
                 
-                eventos = data.get('events', [])
-                for evento in eventos:
-                    comps = evento.get('competitions', [])
-                    if not comps: continue
+                try:
+                    matches = futuro.result()
+                    calendario[d_fmt] = matches
+                    guardar_last_good(f"cal_{d_str}", matches)
+                    logger.debug(f"{d_fmt}: {len(matches)} partidos")
                     
-                    competitors = comps[0].get('competitors', [])
-                    if len(competitors) == 2:
-                        # ESPN usually lists Home second? Verify logic or just use home/away keys if available
-                        # Actually competitors list usually has 'homeAway': 'home' inside
-                        
-                        team_a_data = competitors[0].get('team', {})
-                        team_b_data = competitors[1].get('team', {})
-                        
-                        # Identify home/away
-                        # Typically index 0 is home, 1 is away in some APIs, but ESPN has 'homeAway' field
-                        team_home = team_a_data if competitors[0].get('homeAway') == 'home' else team_b_data
-                        team_away = team_b_data if competitors[0].get('homeAway') == 'home' else team_a_data
-                        
-                        # Fallback if homeAway not found (rare)
-                        if not team_home: 
-                            team_home = team_a_data
-                            team_away = team_b_data
-                            
-                        abrev_home = team_home.get('abbreviation', '')
-                        abrev_away = team_away.get('abbreviation', '')
-                        
-                        if abrev_home and abrev_away:
-                            matches.append({
-                                'home': normalizar_equipo(abrev_home),
-                                'away': normalizar_equipo(abrev_away)
-                            })
-                
-                calendario[d_fmt] = matches
-                logger.debug(f"{d_fmt}: {len(matches)} partidos")
-                
-            except Exception as e:
-                logger.error(f"Error API para {d_fmt}: {e}")
-                calendario[d_fmt] = []
+                except Exception as e:
+                    logger.error(f"Error API para {d_fmt}: {e}")
+                    calendario[d_fmt] = store.get(f"cal_{d_str}", [])
         
         return calendario
         
@@ -310,6 +533,22 @@ def get_calendario_semanal():
         # Retornar calendario vacío en caso de error total
         return {f"{(datetime.now(TIMEZONE) - timedelta(days=datetime.now(TIMEZONE).weekday()) + timedelta(days=i)).strftime('%a %d')}": [] for i in range(7)}
 
+def indexar_rivales(calendario):
+    """
+    Indexa el calendario semanal por equipo (mismas claves de día que el calendario).
+    
+    Returns:
+        dict: {"Mon 06": {"GSW": "vs LAL", "LAL": "@GSW", ...}, ...}
+              Las claves de cada día son el set de equipos que juegan (lookup O(1)).
+    """
+    return {
+        dia: {
+            **{m['home']: f"vs {m['away']}" for m in partidos},
+            **{m['away']: f"@{m['home']}" for m in partidos},
+        }
+        for dia, partidos in calendario.items()
+    }
+
 @st.cache_data(ttl=900)  # 15 minutos - más frecuente para HOY
 def get_partidos_hoy():
     """
@@ -328,66 +567,36 @@ def get_partidos_hoy():
     try:
         ahora = datetime.now(TIMEZONE)
         hoy_str = ahora.strftime("%Y%m%d")
-        equipos_hoy = []
         rivales_map = {}
         
         logger.info(f"Cargando partidos de hoy: {hoy_str}")
         
-        url = f"http://site.api.espn.com/apis/site/v2/sports/basketball/nba/scoreboard?dates={hoy_str}"
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        
-        data = response.json()
-        eventos = data.get('events', [])
+        partidos = fetch_scoreboard(hoy_str)
         
-        if not eventos:
+        if not partidos:
             logger.warning(f"No hay partidos hoy ({hoy_str})")
             return [], {}
         
-        for evento in eventos:
-            comps = evento.get('competitions', [])
-            if not comps:
-                continue
-            
-            competitors = comps[0].get('competitors', [])
-            
-            if len(competitors) == 2:
-                # Extraer y normalizar equipos
-                team_a_data = competitors[0].get('team', {})
-                team_b_data = competitors[1].get('team', {})
-                
-                abrev_a = team_a_data.get('abbreviation', '')
-                abrev_b = team_b_data.get('abbreviation', '')
-                
-                if not abrev_a or not abrev_b:
-                    logger.warning(f"Partido sin abreviaturas válidas: {team_a_data}, {team_b_data}")
-                    continue
-                
-                eq_a = normalizar_equipo(abrev_a)
-                eq_b = normalizar_equipo(abrev_b)
-                
-                # Agregar a lista de equipos (sin duplicados)
-                if eq_a not in equipos_hoy:
-                    equipos_hoy.append(eq_a)
-                if eq_b not in equipos_hoy:
-                    equipos_hoy.append(eq_b)
-                
-                # Mapear rivales
-                rivales_map[eq_a] = eq_b
-                rivales_map[eq_b] = eq_a
+        # Mapear rivales (las claves son los equipos que juegan, sin duplicados)
+        for m in partidos:
+            rivales_map[m['home']] = m['away']
+            rivales_map[m['away']] = m['home']
+        equipos_hoy = list(rivales_map)
         
         logger.info(f"Partidos hoy: {len(equipos_hoy)//2} juegos, {len(equipos_hoy)} equipos")
+        guardar_last_good(f"hoy_{hoy_str}", (equipos_hoy, rivales_map))
         return equipos_hoy, rivales_map
         
     except requests.RequestException as e:
         logger.error(f"Error de red en get_partidos_hoy: {e}")
-        return [], {}
     except (KeyError, ValueError, json.JSONDecodeError) as e:
         logger.error(f"Error parseando datos de hoy: {e}")
-        return [], {}
     except Exception as e:
         logger.error(f"Error crítico en get_partidos_hoy: {e}")
-        return [], {}
+    
+    # Fallback: último resultado válido de hoy (si existe; desde disco llega como lista)
+    equipos_hoy, rivales_map = _last_good().get(f"hoy_{datetime.now(TIMEZONE).strftime('%Y%m%d')}", ([], {}))
+    return equipos_hoy, rivales_map
 
 @st.cache_data(ttl=21600)  # 6 horas - standings cambian lento
 def get_sos_map():
@@ -403,23 +612,27 @@ def get_sos_map():
     try:
         logger.info("Cargando SOS desde ESPN API")
         url = "http://site.api.espn.com/apis/site/v2/sports/basketball/nba/standings"
-        response = requests.get(url, timeout=5)
+        response = get_session().get(url, timeout=HTTP_TIMEOUT)
         response.raise_for_status()
         
-        data = response.json()
+        data = parse_json(response.content)
         
-        for conference in data.get('children', []):
-            for team in conference.get('standings', {}).get('entries', []):
-                abbr = team.get('team', {}).get('abbreviation', '')
-                if not abbr:
-                    continue
-                
-                # Buscar winPercent en stats
-                for stat in team.get('stats', []):
-                    if stat.get('name') == 'winPercent':
-                        win_pct = stat.get('value', 0.5)
-                        sos[normalizar_equipo(abbr)] = win_pct
-                        break
+        # Entradas de ambas conferencias aplanadas en una sola pasada
+        entradas = (
+            e for conference in data.get('children', ())
+            for e in conference.get('standings', {}).get('entries', ())
+        )
+        for team in entradas:
+            abbr = team.get('team', {}).get('abbreviation', '')
+            if not abbr:
+                continue
+            
+            win_pct = next(
+                (stat.get('value', 0.5) for stat in team.get('stats', []) if stat.get('name') == 'winPercent'),
+                None
+            )
+            if win_pct is not None:
+                sos[normalizar_equipo(abbr)] = win_pct
         
         logger.info(f"SOS cargado para {len(sos)} equipos desde API")
         
@@ -483,18 +696,18 @@ def get_ownership(liga):
                 "sortPercOwned": {"sortPriority": 1, "sortAsc": False}
             }
         }
-        headers = {'x-fantasy-filter': json.dumps(filters)}
+        headers = {'x-fantasy-filter': dump_json(filters)}
         
-        response = requests.get(
+        response = get_session().get(
             url,
             params={'view': 'kona_player_info'},
             headers=headers,
             cookies=liga.espn_request.cookies,
-            timeout=10
+            timeout=(2, 10)
         )
         response.raise_for_status()
         
-        data = response.json()
+        data = parse_json(response.content)
         ownership_data = {}
         
         for player in data.get('players', []):
@@ -505,27 +718,31 @@ def get_ownership(liga):
                 ownership_data[player_id] = ownership
         
         logger.info(f"Ownership cargado para {len(ownership_data)} jugadores")
+        _last_good()[f"own_{liga.league_id}"] = ownership_data
         return ownership_data
         
     except requests.RequestException as e:
         logger.error(f"Error obteniendo ownership: {e}")
-        return {}
     except Exception as e:
         logger.error(f"Error crítico en get_ownership: {e}")
-        return {}
+    
+    return _last_good().get(f"own_{liga.league_id}", {})
 
 def get_news_safe():
     try:
-        r = requests.get("https://www.espn.com/espn/rss/nba/news", headers={'User-Agent': 'Mozilla/5.0'}, timeout=3)
-        if r.status_code != 200: return []
+        r = get_session().get("https://www.espn.com/espn/rss/nba/news", headers={'User-Agent': 'Mozilla/5.0'}, timeout=(2, 3))
+        r.raise_for_status()
         root = ET.fromstring(r.content)
         items = []
         for i in root.findall('./channel/item')[:6]:
             t = i.find('title'); l = i.find('link'); d = i.find('pubDate')
             if t is not None and l is not None:
                 items.append({'t': t.text, 'l': l.text, 'd': d.text if d is not None else ""})
+        _last_good()['news'] = items
         return items
-    except: return []
+    except (requests.RequestException, ET.ParseError) as e:
+        logger.warning(f"Error obteniendo noticias: {e}")
+        return _last_good().get('news', [])
 
 def get_league_activity(liga):
     try:
@@ -542,28 +759,76 @@ def get_league_activity(liga):
         return pd.DataFrame(logs)
     except: return pd.DataFrame()
 
-def calc_score(player, config, season_id):
-    s = player.stats.get(f"{season_id}_total", {}).get('avg', {}) 
-    if not s: s = player.stats.get(f"{season_id}_projected", {}).get('avg', {})
-    if not s: s = player.stats.get(f"{season_id}_last_15", {}).get('avg', {})
+_EMPTY = {}  # Default compartido de solo lectura para lookups encadenados
+
+@lru_cache(maxsize=8)
+def claves_stats(season_id):
+    """Claves de stats por temporada, formateadas una sola vez: (total, projected, last_15)"""
+    return f"{season_id}_total", f"{season_id}_projected", f"{season_id}_last_15"
+
+def stats_promedio(player, season_id):
+    """
+    Promedios del jugador (total -> projected -> last_15).
+    
+    Se resuelven una vez por objeto y temporada y quedan guardados en el
+    propio jugador; el resultado sobrevive a los reruns mientras viva el
+    objeto cacheado (liga: 10 min, free agents: 10 min).
+    """
+    cached = getattr(player, '_fgm_avg', None)
+    if cached is not None and cached[0] == season_id:
+        return cached[1]
+    
+    k_total, k_proj, k_l15 = claves_stats(season_id)
+    ps = player.stats
+    s = (ps.get(k_total, _EMPTY).get('avg', _EMPTY)
+         or ps.get(k_proj, _EMPTY).get('avg', _EMPTY)
+         or ps.get(k_l15, _EMPTY).get('avg', _EMPTY))
+    player._fgm_avg = (season_id, s)
+    return s
+
+def calc_score(player, config, season_id, dd_on=None):
+    """
+    Score fantasy rápido a partir de los promedios del jugador.
+    
+    dd_on: si la liga puntúa DD. Pasarlo precalculado en loops para no
+           buscar 'DD' en config['categorias'] por jugador.
+    """
+    s = stats_promedio(player, season_id)
+    if dd_on is None:
+        dd_on = 'DD' in config['categorias']
+    
+    # Mismo memo que stats_promedio: el score vive en el jugador mientras no cambien temporada ni DD
+    cached = getattr(player, '_fgm_score', None)
+    if cached is not None and cached[0] == (season_id, dd_on):
+        return cached[1], s
     
     score = s.get('PTS',0) + s.get('REB',0)*1.2 + s.get('AST',0)*1.5 + s.get('STL',0)*2 + s.get('BLK',0)*2
-    if 'DD' in config['categorias']: score += s.get('DD', 0) * 5
+    if dd_on: score += s.get('DD', 0) * 5
+    player._fgm_score = ((season_id, dd_on), score)
     return score, s
 
+# Categorías acumuladas en el matchup (orden fijo = columnas de la matriz)
+MATCHUP_CATS = ('PTS', 'REB', 'AST', 'STL', 'BLK', '3PTM', 'TO', 'DD', 'FGM', 'FGA', 'FTM', 'FTA')
+
 def calc_matchup_totals(lineup):
-    t = {k: 0 for k in ['PTS','REB','AST','STL','BLK','3PTM','TO','DD','FGM','FGA','FTM','FTA']}
+    rows = []
+    clave = None  # Clave con 'total' resuelta por el primer jugador que la necesite
     for p in lineup:
-        if p.slot_position in ['BE', 'IR']: continue
+        if p.slot_position in {'BE', 'IR'}: continue
         s = p.stats.get('total', {}) or {}
         if not s and p.stats:
-             for k, v in p.stats.items():
-                if isinstance(v, dict) and 'total' in v: s = v['total']; break
+            v = p.stats.get(clave) if clave is not None else None
+            if isinstance(v, dict) and 'total' in v:
+                s = v['total']
+            else:
+                for k, v in p.stats.items():
+                    if isinstance(v, dict) and 'total' in v: s = v['total']; clave = k; break
         if not s: continue
-        for c in t:
-            if c in ['FGM','FGA','FTM','FTA']: t[c] += s.get(c, 0)
-            elif c == '3PTM': t[c] += s.get('3PM', s.get('3PTM', 0))
-            else: t[c] += s.get(c, 0)
+        rows.append([s.get('3PM', s.get('3PTM', 0)) if c == '3PTM' else s.get(c, 0) for c in MATCHUP_CATS])
+    
+    # Una sola reducción (jugadores x categorías) en NumPy
+    tot = np.asarray(rows, dtype=np.float64).sum(axis=0) if rows else np.zeros(len(MATCHUP_CATS))
+    t = dict(zip(MATCHUP_CATS, tot.tolist()))
     if t['FGA']: t['FG%'] = t['FGM']/t['FGA']
     if t['FTA']: t['FT%'] = t['FTM']/t['FTA']
     return t
@@ -583,63 +848,51 @@ with st.sidebar:
     excluir_out = st.checkbox("Ignorar 'OUT' en Grid", True)
     if st.button("🔄 Refrescar Datos", type="primary", key="refresh_data_btn"): 
         st.cache_data.clear()
+        st.cache_resource.clear()
         if cache_mgr:
             cache_mgr.cache_metadata.clear()
         logger.info("🔄 Cache limpiado")
 
 config = LIGAS[nombre_liga]
 
-# Conectar con retry automático si está disponible
-if USE_MODERN_CONFIG:
-    liga = obtener_liga(nombre_liga, LIGAS)
-else:
-    # Legacy: necesita adaptar la función vieja
-    from src.conectar import obtener_liga as obtener_liga_legacy
-    # Hack temporal para compatibilidad
-    import sys
-    sys.modules['src.conectar'].LIGAS = LIGAS
-    liga = obtener_liga_legacy(nombre_liga)
+liga = get_liga(nombre_liga)
 
 season_id = config['year']
 
 if not liga: 
+    get_liga.clear()  # No cachear conexiones fallidas
     st.error("❌ Error de conexión. Revisa tu configuración en .env o credenciales.py")
     if USE_MODERN_CONFIG:
         st.info("💡 Tip: Verifica que el archivo .env existe y tiene las credenciales correctas")
     st.stop()
 
-box_scores = liga.box_scores()
+box_scores = get_box_scores(liga, nombre_liga)
 
-# Obtener el nombre del equipo del usuario desde configuración
+# Obtener el equipo del usuario desde configuración (id preferido, nombre como respaldo)
 my_team_name = config.get('my_team_name', '')
+# Sin id configurado se usa el que se aprendió en el primer match por nombre de la sesión
+my_team_id = config.get('my_team_id') or st.session_state.get(f"team_id_{nombre_liga}")
 
-# Buscar el matchup del usuario
-matchup = None
-if my_team_name:
-    # Buscar por nombre de equipo configurado
-    matchup = next((m for m in box_scores if my_team_name in m.home_team.team_name or my_team_name in m.away_team.team_name), None)
+# Buscar el matchup del usuario en los box_scores actuales en cada rerun (~6 matchups).
+# Lo que se memoriza en session_state es el team_id, no la posición: una posición
+# guardada apuntaría a otro partido cuando cambian los emparejamientos de la semana.
+matchup_idx, soy_home, matchup_encontrado = buscar_matchup(box_scores, my_team_name, my_team_id)
+matchup = box_scores[matchup_idx] if matchup_idx is not None else None
 
-if not matchup and box_scores:
-    # Fallback: tomar el primer matchup (usuario debe configurar my_team_name)
-    matchup = box_scores[0]
-    st.warning(f"⚠️ Mostrando primer matchup. Configura `LIGA_X_MY_TEAM_NAME` en .env para ver tu matchup correcto.")
+if matchup and not matchup_encontrado:
+    # Fallback: primer matchup (usuario debe configurar my_team_name)
+    st.warning(f"⚠️ Mostrando primer matchup. Configura `LIGA_X_MY_TEAM_ID` (o `LIGA_X_MY_TEAM_NAME`) en .env para ver tu matchup correcto.")
 
 if not matchup: 
     st.warning("No hay matchup activo esta semana."); 
     st.stop()
 
-# Determinar cuál equipo es el del usuario
-if my_team_name and my_team_name in matchup.home_team.team_name:
-    soy_home = True
-elif my_team_name and my_team_name in matchup.away_team.team_name:
-    soy_home = False
-else:
-    # Si no se configuró, asumir que eres el home team
-    soy_home = True
-
 mi_equipo = matchup.home_team if soy_home else matchup.away_team
 rival = matchup.away_team if soy_home else matchup.home_team
 
+if matchup_encontrado and not my_team_id:
+    st.session_state[f"team_id_{nombre_liga}"] = getattr(mi_equipo, 'team_id', None)
+
 # HEADER
 st.markdown(f"<div class='league-tag'>{nombre_liga}</div>", unsafe_allow_html=True)
 c1, c2, c3 = st.columns([5, 1, 5])
@@ -652,6 +905,7 @@ st.write("")
 with st.expander("📅 Smart Planificación Semanal (Grid)", expanded=True):
     # Calculo de datos del Grid Original (Simplified for stability)
     calendario = get_calendario_semanal()
+    rivales_semana = indexar_rivales(calendario)  # Mismo calendario que `dias`: claves siempre alineadas
     
     # --- SMART OVERLAY ---
     # Cargar datos de expertos (cacheado)
@@ -667,24 +921,11 @@ with st.expander("📅 Smart Planificación Semanal (Grid)", expanded=True):
     # Header Dates
     dias = list(calendario.keys())
     
-    def get_smart_cell(player, day_teams):
-        # Determine if playing
-        norm_team = normalizar_equipo(player.proTeam)
-        juega = False
-        opp = ""
+    def get_smart_cell(player, norm_team, day_rivals):
+        # Determine if playing (lookup directo en el índice del día)
+        opp = day_rivals.get(norm_team)
         
-        # Check against teams playing today
-        for t in day_teams:
-            if t['home'] == norm_team:
-                juega = True
-                opp = f"vs {t['away']}" # vs OPP
-                break
-            elif t['away'] == norm_team:
-                juega = True
-                opp = f"@{t['home']}" # at OPP
-                break
-        
-        if not juega:
+        if not opp:
             return "" # Empty cell
         
         # Add metadata marks
@@ -700,27 +941,32 @@ with st.expander("📅 Smart Planificación Semanal (Grid)", expanded=True):
         return f"{' '.join(marks)} {opp}" if marks else opp
 
     # Process My Team for Grid
-    my_active_players = [p for p in mi_equipo.roster if p.lineupSlot != 'IR']
+    # Preselección: equipo normalizado una sola vez por jugador (no por día)
+    my_active_players = [(p, normalizar_equipo(p.proTeam)) for p in mi_equipo.roster if p.lineupSlot != 'IR']
     
     # Sort by expert rank (or avg stats) for better visibility
-    def sorting_key(p):
+    def sorting_key(item):
+        p = item[0]
         if p.name in expert_data:
             return expert_data[p.name].get('fantasypros_rank', 999)
         return 999
         
     my_active_players.sort(key=sorting_key)
     
-    for p in my_active_players:
+    total_games_me = 0
+    for p, norm_team in my_active_players:
         row = {'JUGADOR': p.name}
         games_count = 0
         
         for dia in dias:
-            cell = get_smart_cell(p, calendario[dia])
+            cell = get_smart_cell(p, norm_team, rivales_semana[dia])
             row[dia] = cell
             if cell: games_count += 1
             
         row['TOTAL'] = games_count
         grid_data.append(row)
+        if not (excluir_out and p.injuryStatus == 'OUT'):
+            total_games_me += games_count
         
     st.dataframe(
         pd.DataFrame(grid_data),
@@ -733,16 +979,17 @@ with st.expander("📅 Smart Planificación Semanal (Grid)", expanded=True):
     )
     
     # --- METRICS SUMMARY ---
-    total_games_me = sum(r['TOTAL'] for r in grid_data)
     # Estimate Opponent games (simplified)
-    total_games_opp = 0
-    for p in rival.roster:
-        if p.lineupSlot != 'IR':
-            for dia in dias:
-                # Basic check logic
-                for t in calendario[dia]:
-                    if t['home'] == normalizar_equipo(p.proTeam) or t['away'] == normalizar_equipo(p.proTeam):
-                        total_games_opp += 1
+    # Equipos del rival preseleccionados una vez: sin IR (ni OUT si se ignora)
+    rival_teams = tuple(
+        normalizar_equipo(p.proTeam) for p in rival.roster
+        if p.lineupSlot != 'IR' and not (excluir_out and p.injuryStatus == 'OUT')
+    )
+    # Matriz (jugadores x días) de quién juega; el total es una sola reducción
+    juega_opp = np.array(
+        [[t in rivales_semana[dia] for dia in dias] for t in rival_teams], dtype=bool
+    ).reshape(len(rival_teams), len(dias))
+    total_games_opp = int(juega_opp.sum())
                         
     diff_games = total_games_me - total_games_opp
     
@@ -750,18 +997,16 @@ with st.expander("📅 Smart Planificación Semanal (Grid)", expanded=True):
     c1.metric("Mis Partidos", total_games_me)
     c2.metric("Rival Partidos", total_games_opp, delta=diff_games)
     c3.caption(f"🌟/⭐ = Top 50/100  |  🩹 = DTD  |  ❌ = OUT")
-tab1, tab2, tab3, tab4 = st.tabs([
-    "🔥 Hoy", 
-    "⚔️ Matchup", 
-    "🔮 IA",
-    "📚 Learning"  # NEW
-])
+# Navegación por vistas: st.tabs ejecuta las 4 pestañas en cada rerun,
+# con un selector solo se calcula (y se consulta a ESPN) la vista activa
+VISTAS = ("🔥 Hoy", "⚔️ Matchup", "🔮 IA", "📚 Learning")
+vista = st.radio("Vista", VISTAS, horizontal=True, key="vista_activa", label_visibility="collapsed")
 necesidades = []
 
 # 1. FACE-OFF (ARREGLADO: 0 vs 0 FIX + SEMÁFORO BACKUP)
-with tab1:
-    equipos_hoy, rivales_hoy = get_partidos_hoy()
-    sos_map = get_sos_map()
+if vista == VISTAS[0]:
+    # Partidos de hoy + SOS en una sola ola de red (como en la vista IA)
+    (equipos_hoy, rivales_hoy), sos_map = en_paralelo((get_partidos_hoy,), (get_sos_map,))
     
     # Cargar expert data
     expert_scraper = ExpertScrapers()
@@ -770,27 +1015,42 @@ with tab1:
     except:
         expert_data = {}
 
+    # Set de equipos que juegan hoy: se construye una sola vez, no por jugador
+    equipos_hoy_set = equipos_en_juego(equipos_hoy)
+    dd_on = 'DD' in config['categorias']
+
     def get_power(roster):
-        l = []
+        # 1. Filtro: solo jugadores activos, sanos y que juegan hoy
+        candidatos = []
         for p in roster:
-            if p.lineupSlot != 'IR' and p.injuryStatus != 'OUT':
-                if jugador_juega_hoy(p.proTeam, equipos_hoy):
-                    norm_team = normalizar_equipo(p.proTeam)
-                    opp = rivales_hoy.get(norm_team, "")
-                    si = get_sos_icon(opp, sos_map)
-                    sc, _ = calc_score(p, config, season_id)
-                    
-                    # Expert badge
-                    badge = ""
-                    if p.name in expert_data:
-                        rank = expert_data[p.name].get('fantasypros_rank', 999)
-                        if rank <= 50: badge = "🌟"
-                        elif rank <= 100: badge = "⭐"
-                    
-                    # Keep FP as raw number for ProgressColumn
-                    l.append({'Jugador': f"{badge} {p.name}", 'Rival': f"{si} {opp}", 'FP': sc})
+            if p.lineupSlot == 'IR' or p.injuryStatus == 'OUT':
+                continue
+            norm_team = normalizar_equipo(p.proTeam)
+            if norm_team in equipos_hoy_set:
+                candidatos.append((p, norm_team))
+        
+        # 2. Scoring + top-N con heap (O(n log k)); solo los titulares llevan formato
+        top = heapq.nlargest(
+            limit_slots,
+            ((calc_score(p, config, season_id, dd_on)[0], p, norm_team) for p, norm_team in candidatos),
+            key=lambda x: x[0]
+        )
+        
+        l = []
+        for sc, p, norm_team in top:
+            opp = rivales_hoy.get(norm_team, "")
+            si = get_sos_icon(opp, sos_map)
+            
+            # Expert badge
+            badge = ""
+            if p.name in expert_data:
+                rank = expert_data[p.name].get('fantasypros_rank', 999)
+                if rank <= 50: badge = "🌟"
+                elif rank <= 100: badge = "⭐"
+            
+            # Keep FP as raw number for ProgressColumn
+            l.append({'Jugador': f"{badge} {p.name}", 'Rival': f"{si} {opp}", 'FP': sc})
         
-        l = sorted(l, key=lambda x: x['FP'], reverse=True)[:limit_slots]
         return sum(x['FP'] for x in l), l
 
     my_p, my_l = get_power(mi_equipo.roster)
@@ -839,7 +1099,7 @@ with tab1:
 
 # 2. MATCHUP
 # 2. MATCHUP INTELLIGENCE DASHBOARD
-with tab2:
+if vista == VISTAS[1]:
     st.header("⚔️ Matchup Intelligence Dashboard")
     
     # --- DATA PREPARATION ---
@@ -950,24 +1210,23 @@ with tab2:
             # --- PREDICTIVE GRID ---
             st.subheader("📊 Tablero de Control")
             
-            dat = []
-            w, l, t = 0, 0, 0
+            # Vectores por categoría (una sola pasada, sin ramas por fila)
+            cats = list(config['categorias'])
+            val_mio = np.array([ms.get(c, 0) for c in cats], dtype=float)
+            val_riv = np.array([rs.get(c, 0) for c in cats], dtype=float)
+            signo = np.where(np.array(cats) == 'TO', -1.0, 1.0)  # TO: menos es mejor
+            diff = (val_mio - val_riv) * signo
             
-            for c in config['categorias']:
-                k = '3PTM' if c == '3PTM' and '3PTM' not in ms else c
-                m, r = ms.get(k, 0), rs.get(k, 0)
-                d = m - r if c != 'TO' else r - m
-                
-                # Prediction Badge
-                cat_prob = prediction['category_probs'].get(c, 0.5)
-                if cat_prob >= 0.6: status = "🟢 Ganando"
-                elif cat_prob <= 0.4: status = "🔴 Perdiendo"
-                else: status = "🟡 Reñido"
-                
-                # Keep raw numbers for styling
-                dat.append([c, m, r, d, status])
-
-            df_matchup = pd.DataFrame(dat, columns=['CAT','YO','RIV','DIF', 'STATUS'])
+            # Prediction Badge
+            cat_probs = np.array([prediction['category_probs'].get(c, 0.5) for c in cats], dtype=float)
+            status = np.select(
+                [cat_probs >= 0.6, cat_probs <= 0.4],
+                ["🟢 Ganando", "🔴 Perdiendo"],
+                default="🟡 Reñido"
+            )
+            
+            # Keep raw numbers for styling
+            df_matchup = pd.DataFrame({'CAT': cats, 'YO': val_mio, 'RIV': val_riv, 'DIF': diff, 'STATUS': status})
             
             st.dataframe(
                 df_matchup,
@@ -994,7 +1253,9 @@ with tab2:
              
 
 # 3. AI RECOMMENDATIONS
-with tab3:
+# Fragmento: los botones de esta vista re-ejecutan solo la vista, no la app entera
+@st.fragment
+def vista_ia():
     st.header("🧠 Recomendaciones Inteligentes")
     
     st.markdown("""
@@ -1010,27 +1271,27 @@ with tab3:
                 from src.smart_recommender import SmartRecommender
                 
                 # Get data needed
-                sos_map = get_sos_map()
-                equipos_hoy, _ = get_partidos_hoy()
-                box_scores = liga.box_scores()
-                
-                # Find current matchup
-                my_team_name = config.get('my_team_name', '')
-                current_matchup = None
-                if my_team_name:
-                    current_matchup = next((m for m in box_scores if my_team_name in m.home_team.team_name or my_team_name in m.away_team.team_name), None)
+                # FA (cacheados) para el recomendador y el análisis narrativo.
+                # None si fallan: el recomendador hace entonces su propia petición
+                # en vez de analizar un pool vacío.
+                def get_free_agents_seguro():
+                    try:
+                        return get_free_agents(liga, nombre_liga, 150)
+                    except Exception as e:
+                        logger.warning(f"Free agents no disponibles: {e}")
+                        return None
                 
-                if not current_matchup and box_scores:
-                    current_matchup = box_scores[0]
+                # Todas las llamadas de red del análisis (SOS, partidos de hoy y
+                # los 150 FA) en una sola ola paralela
+                sos_map, (equipos_hoy, _), free_agents = en_paralelo(
+                    (get_sos_map,),
+                    (get_partidos_hoy,),
+                    (get_free_agents_seguro,),
+                )
                 
-                # Determine my team and opponent
-                if my_team_name and current_matchup:
-                    if my_team_name in current_matchup.home_team.team_name:
-                        opponent_team = current_matchup.away_team
-                    else:
-                        opponent_team = current_matchup.home_team
-                else:
-                    opponent_team = current_matchup.away_team if current_matchup else mi_equipo
+                # Reusar el matchup ya resuelto (sin segundo box_scores())
+                current_matchup = matchup
+                opponent_team = rival
                 
                 # DEBUG: Explore matchup structure
                 if current_matchup:
@@ -1049,7 +1310,8 @@ with tab3:
                     opponent_team, 
                     current_matchup, 
                     sos_map, 
-                    list(equipos_hoy)
+                    list(equipos_hoy),
+                    available_players=free_agents
                 )
                 
                 # Display STRATEGIC CONTEXT first
@@ -1241,15 +1503,12 @@ with tab3:
                         matchup_state = result.get('context', {}).get('matchup', {})
                         acq_budget = result.get('context', {}).get('acquisitions', {})
                         
-                        # Get free agents for streaming suggestions
-                        free_agents = liga.free_agents(size=100)
-                        
                         # Generate analysis
                         analysis = generate_strategic_analysis(
                             mi_equipo, rival, matchup,
                             equipos_hoy, today_schedule,
                             config['categorias'],
-                            matchup_state, acq_budget, free_agents
+                            matchup_state, acq_budget, (free_agents or [])[:100]
                         )
                         
                         # Mostrar narrativa completa
@@ -1270,7 +1529,6 @@ with tab3:
                             with st.expander("🎯 Ver candidatos de streaming recomendados"):
                                 targets = analysis['streaming_play']['step_b']
                                 if targets:
-                                    import pandas as pd
                                     df = pd.DataFrame(targets)
                                     st.dataframe(df, use_container_width=True, hide_index=True)
                                 else:
@@ -1312,8 +1570,12 @@ with tab3:
         - Aprende de tus decisiones
         """)
 
+if vista == VISTAS[2]:
+    vista_ia()
+
 # --- 4. LEARNING TAB ---
-render_learning_tab(tab4, liga)
+if vista == VISTAS[3]:
+    render_learning_tab(st.container(), liga)
 
 # --- FOOTER ESPACIADOR PARA MÓVIL ---
 st.write("<br><br><br>", unsafe_allow_html=True) 
@@ -1,7 +1,7 @@
 """Sistema de configuración moderno con validación"""
 import os
 from dotenv import load_dotenv
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,7 +30,8 @@ class ConfigManager:
                     "swid": os.getenv(f"LIGA_{i}_SWID"),
                     "espn_s2": os.getenv(f"LIGA_{i}_ESPN_S2"),
                     "categorias": os.getenv(f"LIGA_{i}_CATEGORIAS").split(","),
-                    "my_team_name": os.getenv(f"LIGA_{i}_MY_TEAM_NAME", "")  # Opcional
+                    "my_team_name": os.getenv(f"LIGA_{i}_MY_TEAM_NAME", ""),  # Opcional
+                    "my_team_id": self._parse_team_id(nombre, os.getenv(f"LIGA_{i}_MY_TEAM_ID"))  # Opcional (preferido sobre el nombre)
                 }
                 
                 # Validación básica
@@ -54,6 +55,16 @@ class ConfigManager:
         
         return ligas
     
+    def _parse_team_id(self, nombre: str, valor: Optional[str]) -> Optional[int]:
+        """Parsea el team id opcional; un valor inválido no descarta la liga"""
+        if not valor or not valor.strip():
+            return None
+        try:
+            return int(valor)
+        except ValueError:
+            logger.warning(f"⚠️ MY_TEAM_ID inválido para liga '{nombre}': {valor!r}. Se usará el nombre del equipo")
+            return None
+    
     def _validate_liga(self, nombre: str, config: Dict):
         """Valida configuración de liga"""
         required = ["league_id", "year", "swid", "espn_s2", "categorias"]
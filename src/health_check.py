@@ -4,20 +4,25 @@ import requests
 from datetime import datetime
 import pytz
 
+@st.cache_data(ttl=60, show_spinner=False)
+def check_espn_api():
+    """Ping a ESPN, cacheado 1 min para no bloquear cada rerun del sidebar"""
+    try:
+        r = requests.get(
+            "http://site.api.espn.com/apis/site/v2/sports/basketball/nba/scoreboard",
+            timeout=(2, 3)
+        )
+        return "🟢 Online" if r.status_code == 200 else "🔴 Error"
+    except requests.RequestException:
+        return "🔴 No disponible"
+
 def show_diagnostic_panel():
     """Muestra panel de diagnóstico en sidebar"""
     with st.sidebar.expander("🔧 Diagnóstico", expanded=False):
         st.caption("**Sistema**")
         
         # Check ESPN API
-        try:
-            r = requests.get(
-                "http://site.api.espn.com/apis/site/v2/sports/basketball/nba/scoreboard",
-                timeout=3
-            )
-            api_status = "🟢 Online" if r.status_code == 200 else "🔴 Error"
-        except:
-            api_status = "🔴 No disponible"
+        api_status = check_espn_api()
         
         st.caption(f"ESPN API: {api_status}")
         
@@ -35,5 +40,6 @@ def show_diagnostic_panel():
         # Botón de reset completo
         if st.button("🔄 Reset Total", type="secondary"):
             st.cache_data.clear()
+            st.cache_resource.clear()
             st.session_state.clear()
             st.rerun()
@@ -663,7 +663,6 @@ class RosterOptimizer:
         # Analyze available players WITH EXPERT DATA
         # 🔥 NEW: Filter out WAIVER players (not available immediately)
         available_scores = {}
-        waiver_skipped = 0
         
         # Get waiver blacklist from recent activity
         waiver_blacklist = set()
@@ -672,28 +671,13 @@ class RosterOptimizer:
             if waiver_blacklist:
                 logger.info(f"📋 Found {len(waiver_blacklist)} players on waiver blacklist (recent drops)")
         
-        for player in available_players[:100]:  # Top 100 available
-            # Skip players on WAIVER (only Free Agents)
-            if hasattr(player, 'onTeamId'):
-                if player.onTeamId != 0:
-                    waiver_skipped += 1
-                    logger.debug(f"⏭️ Skipping {player.name} - on team (onTeamId={player.onTeamId})")
-                    continue
-            
-            # 🔥 NEW: Check recent drops (Waiver Status)
-            if player.name in waiver_blacklist:
-                waiver_skipped += 1
-                logger.info(f"⏭️ Skipping {player.name} - RECENT DROP (Waiver)")
-                continue
-            
-            # 🔥 NEW: Check acquisition status (FREEAGENT vs WAIVERS)
-            if hasattr(player, 'status'):
-                status = str(player.status).upper()
-                if status == 'WAIVERS' or status == 'CLAIM':
-                    waiver_skipped += 1
-                    logger.debug(f"⏭️ Skipping {player.name} - status is {status}")
-                    continue
-            
+        # Stage 1: cheap availability filter builds the shortlist
+        pool = available_players[:100]  # Top 100 available
+        candidates = [p for p in pool if self._is_immediately_available(p, waiver_blacklist)]
+        waiver_skipped = len(pool) - len(candidates)
+        
+        # Stage 2: full analysis only over the shortlist
+        for player in candidates:
             analysis = self.analyzer.analyze_player(
                 player, injuries, schedule_info, categories, expert_data
             )
@@ -739,6 +723,14 @@ class RosterOptimizer:
             logger.warning("❌ No add candidates found.")
             return []
 
+        # Name -> player indexes (first occurrence wins, like a linear scan)
+        roster_by_name = {}
+        for p in my_roster:
+            roster_by_name.setdefault(p.name, p)
+        candidates_by_name = {}
+        for p in candidates:
+            candidates_by_name.setdefault(p.name, p)
+        
         # Generate recommendations
         recs_count = 0
         for drop_name, drop_analysis in drop_candidates:
@@ -751,8 +743,8 @@ class RosterOptimizer:
                 if impact > 10:
                     
                     # Find player objects
-                    drop_player = next((p for p in my_roster if p.name == drop_name), None)
-                    add_player = next((p for p in available_players if p.name == add_name), None)
+                    drop_player = roster_by_name.get(drop_name)
+                    add_player = candidates_by_name.get(add_name)
                     
                     if drop_player and add_player:
                         # Validate sanity
@@ -791,6 +783,27 @@ class RosterOptimizer:
         return recommendations[:top_n]
         
 
+    def _is_immediately_available(self, player, waiver_blacklist: set) -> bool:
+        """True if the player can be added right now (Free Agent, not on waivers)"""
+        # Skip players on WAIVER (only Free Agents)
+        if getattr(player, 'onTeamId', 0) != 0:
+            logger.debug(f"⏭️ Skipping {player.name} - on team (onTeamId={player.onTeamId})")
+            return False
+        
+        # Check recent drops (Waiver Status)
+        if player.name in waiver_blacklist:
+            logger.info(f"⏭️ Skipping {player.name} - RECENT DROP (Waiver)")
+            return False
+        
+        # Check acquisition status (FREEAGENT vs WAIVERS)
+        if hasattr(player, 'status'):
+            status = str(player.status).upper()
+            if status == 'WAIVERS' or status == 'CLAIM':
+                logger.debug(f"⏭️ Skipping {player.name} - status is {status}")
+                return False
+        
+        return True
+    
     def _get_waiver_players(self, league, lookback_days=2) -> set:
         """
         Identify players dropped in the last X days via League Activity
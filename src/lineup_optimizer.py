@@ -28,6 +28,7 @@ class LineupOptimizer:
         - ACTIVE_TO_IR: Player injured, move to IR
         """
         recommendations = []
+        today_games = frozenset(today_games)  # O(1) membership per player
         
         # 1. Check IR slots - players that recovered
         ir_players = [p for p in roster if p.lineupSlot == 'IR']
@@ -44,11 +44,15 @@ class SmartRecommender:
         logger.info("✅ SmartRecommender initialized with LEARNING SYSTEM (expert data + ML)")
     
     
-    def get_daily_recommendations(self, my_team, opponent, matchup, sos_map, today_games) -> dict:
+    def get_daily_recommendations(self, my_team, opponent, matchup, sos_map, today_games,
+                                  available_players=None) -> dict:
         """
         Generate STRATEGIC recommendations for today
         NOW INCLUDES: Playoff context, matchup state, acquisition budget, timing
         
+        available_players: optional pre-fetched free agents (e.g. the app's cached
+        list); fetched here with league.free_agents(size=150) when not given.
+        
         Returns:
             {
                 'context': {...},  # Strategic context
@@ -59,6 +63,9 @@ class SmartRecommender:
         try:
             logger.info("🔍 Starting ADVANCED daily analysis...")
             
+            # Set once: every downstream check is a membership test
+            today_games = frozenset(today_games)
+            
             # 1. STRATEGIC CONTEXT
             playoff_ctx = self.strategy_analyzer.get_playoff_context()
             matchup_state = self.strategy_analyzer.analyze_matchup_state(my_team, matchup)
@@ -111,7 +118,8 @@ class SmartRecommender:
             
             # 4. Get roster and available players
             my_roster = my_team.roster
-            available_players = self.league.free_agents(size=150)
+            if available_players is None:
+                available_players = self.league.free_agents(size=150)
             
             logger.info(f"👥 Analyzing {len(my_roster)} roster + {len(available_players)} FA")
             
@@ -123,7 +131,7 @@ class SmartRecommender:
                 schedule_info=schedule_info,
                 categories=self.config['categorias'],
                 expert_data=expert_data,
-                today_games=list(today_games),  # NEW: Pass today's teams
+                today_games=today_games,  # NEW: Pass today's teams
                 is_week_start=acq_budget.get('is_week_start', False),  # NEW: Week start flag
                 league=self.league,  # NEW: Pass league for waiver checking
                 top_n=5
@@ -146,7 +154,7 @@ class SmartRecommender:
             lineup_recs = self.lineup_optimizer.get_lineup_recommendations(
                 roster=my_roster,
                 injuries=injuries,
-                today_games=list(today_games),
+                today_games=today_games,
                 categories=self.config['categorias']
             )
             logger.info(f"🔄 Generated {len(lineup_recs)} lineup change suggestions")